@@ -11,6 +11,8 @@ import (
 	"log"
 	"net/http"
 	"net/http/pprof"
+	"strings"
+	"sync"
 	"time"
 
 	"github.com/iwanhae/kabinet/internal/storage"
@@ -33,7 +35,7 @@ func New(storage *storage.Storage, port string, distFS embed.FS) *Server {
 	mux := http.NewServeMux()
 
 	// API Handler
-	mux.HandleFunc("/query", s.handleQuery)
+	mux.HandleFunc("/query", withGzip(s.handleQuery))
 	mux.HandleFunc("/stats", s.handleStats)
 	mux.HandleFunc("/download", s.handleDownload)
 
@@ -169,6 +171,48 @@ func (s *Server) Shutdown(ctx context.Context) error {
 	return s.server.Shutdown(ctx)
 }
 
+var gzipWriterPool = sync.Pool{
+	New: func() any {
+		gzw, _ := gzip.NewWriterLevel(nil, gzip.BestSpeed)
+		return gzw
+	},
+}
+
+// gzipResponseWriter sends everything written through it to a gzip stream.
+type gzipResponseWriter struct {
+	http.ResponseWriter
+	gzw *gzip.Writer
+}
+
+func (g *gzipResponseWriter) Write(b []byte) (int, error) {
+	return g.gzw.Write(b)
+}
+
+// withGzip compresses responses for clients that accept gzip. Query results
+// are repetitive JSON arrays that shrink several times over, which matters
+// far more than the CPU spent at BestSpeed.
+func withGzip(next http.HandlerFunc) http.HandlerFunc {
+	return func(w http.ResponseWriter, r *http.Request) {
+		w.Header().Add("Vary", "Accept-Encoding")
+		if !strings.Contains(r.Header.Get("Accept-Encoding"), "gzip") {
+			next(w, r)
+			return
+		}
+
+		gzw := gzipWriterPool.Get().(*gzip.Writer)
+		gzw.Reset(w)
+		defer func() {
+			if err := gzw.Close(); err != nil {
+				log.Printf("server: failed to flush gzip response: %v", err)
+			}
+			gzipWriterPool.Put(gzw)
+		}()
+
+		w.Header().Set("Content-Encoding", "gzip")
+		next(&gzipResponseWriter{ResponseWriter: w, gzw: gzw}, r)
+	}
+}
+
 type queryRequest struct {
 	Query string    `json:"query"`
 	Start time.Time `json:"start"`
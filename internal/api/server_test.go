@@ -0,0 +1,78 @@
+package api
+
+import (
+	"compress/gzip"
+	"io"
+	"net/http"
+	"net/http/httptest"
+	"strings"
+	"testing"
+)
+
+func TestWithGzip(t *testing.T) {
+	body := strings.Repeat(`{"reason":"FailedMount","count":1},`, 100)
+	handler := withGzip(func(w http.ResponseWriter, r *http.Request) {
+		w.Header().Set("Content-Type", "application/json")
+		_, _ = io.WriteString(w, body)
+	})
+
+	testCases := []struct {
+		name           string
+		acceptEncoding string
+		expectGzip     bool
+	}{
+		{
+			name:           "No Accept-Encoding",
+			acceptEncoding: "",
+			expectGzip:     false,
+		},
+		{
+			name:           "Accepts gzip",
+			acceptEncoding: "gzip, deflate, br",
+			expectGzip:     true,
+		},
+		{
+			name:           "Accepts other encodings only",
+			acceptEncoding: "br",
+			expectGzip:     false,
+		},
+	}
+
+	for _, tc := range testCases {
+		t.Run(tc.name, func(t *testing.T) {
+			req := httptest.NewRequest(http.MethodPost, "/query", nil)
+			if tc.acceptEncoding != "" {
+				req.Header.Set("Accept-Encoding", tc.acceptEncoding)
+			}
+			rec := httptest.NewRecorder()
+			handler(rec, req)
+
+			if got := rec.Header().Get("Vary"); got != "Accept-Encoding" {
+				t.Errorf("Vary = %q, want %q", got, "Accept-Encoding")
+			}
+
+			var reader io.Reader = rec.Body
+			if tc.expectGzip {
+				if got := rec.Header().Get("Content-Encoding"); got != "gzip" {
+					t.Fatalf("Content-Encoding = %q, want gzip", got)
+				}
+				gzr, err := gzip.NewReader(rec.Body)
+				if err != nil {
+					t.Fatalf("failed to open gzip body: %v", err)
+				}
+				defer gzr.Close()
+				reader = gzr
+			} else if got := rec.Header().Get("Content-Encoding"); got != "" {
+				t.Fatalf("Content-Encoding = %q, want none", got)
+			}
+
+			got, err := io.ReadAll(reader)
+			if err != nil {
+				t.Fatalf("failed to read body: %v", err)
+			}
+			if string(got) != body {
+				t.Errorf("body mismatch: got %d bytes, want %d", len(got), len(body))
+			}
+		})
+	}
+}
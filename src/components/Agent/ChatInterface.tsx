@@ -26,6 +26,8 @@ interface ChatInterfaceProps {
   currentQuery?: AgentPlan["query"];
   onStartInvestigation: (problem: string) => void;
   onStop: () => void;
+  // Called while the user is composing a question
+  onTyping?: () => void;
 }
 
 export const ChatInterface: React.FC<ChatInterfaceProps> = ({
@@ -36,6 +38,7 @@ export const ChatInterface: React.FC<ChatInterfaceProps> = ({
   currentQuery,
   onStartInvestigation,
   onStop,
+  onTyping,
 }) => {
   const [input, setInput] = useState("");
   const bottomRef = useRef<HTMLDivElement>(null);
@@ -182,7 +185,11 @@ export const ChatInterface: React.FC<ChatInterfaceProps> = ({
                   : "Describe the problem (e.g., 'Pods are failing on node-1')..."
               }
               value={input}
-              onChange={(e) => setInput(e.target.value)}
+              onChange={(e) => {
+                setInput(e.target.value);
+                onTyping?.();
+              }}
+              onFocus={onTyping}
               disabled={isBusy}
               InputProps={{
                 disableUnderline: true,
@@ -1,5 +1,6 @@
-import React from "react";
+import React, { useMemo } from "react";
 import type { Message, AgentPlan } from "../../types/agent";
+import { parsePlan } from "../../lib/agent/utils";
 import { DataVisualizer } from "./DataVisualizer";
 import {
   Box,
@@ -24,17 +25,37 @@ interface MessageBubbleProps {
   message: Message;
 }
 
-export const MessageBubble: React.FC<MessageBubbleProps> = ({ message }) => {
+const tryParsePlan = (content: string): AgentPlan | null => {
+  try {
+    return parsePlan(content);
+  } catch {
+    // Not JSON, render as text
+    return null;
+  }
+};
+
+// Memoized: re-parsing and re-serializing results on every chat re-render
+// is wasted work.
+export const MessageBubble = React.memo(({ message }: MessageBubbleProps) => {
   const isUser = message.role === "user";
   const isSystem = message.role === "system";
   const isQueryResult = message.content.startsWith("Query executed. Result:");
 
+  const jsonContent = useMemo(() => {
+    if (!isSystem || !isQueryResult) return "";
+    return message.result
+      ? JSON.stringify(message.result, null, 2)
+      : message.content.replace("Query executed. Result:\n", "");
+  }, [message, isSystem, isQueryResult]);
+
+  const parsedPlan = useMemo(
+    () =>
+      message.role === "assistant" ? tryParsePlan(message.content) : null,
+    [message],
+  );
+
   if (isSystem) {
     if (isQueryResult) {
-      const jsonContent = message.content.replace(
-        "Query executed. Result:\n",
-        "",
-      );
       return (
         <Accordion
           variant="outlined"
@@ -93,15 +114,6 @@ export const MessageBubble: React.FC<MessageBubbleProps> = ({ message }) => {
   }
 
   const content = message.content;
-  let parsedPlan: AgentPlan | null = null;
-
-  if (!isUser) {
-    try {
-      parsedPlan = JSON.parse(message.content);
-    } catch (e) {
-      // Not JSON, render as text
-    }
-  }
 
   return (
     <Box
@@ -226,6 +238,38 @@ export const MessageBubble: React.FC<MessageBubbleProps> = ({ message }) => {
               </Box>
             )}
 
+            {parsedPlan.queries?.map((q, i) => (
+              <Box key={`${i}-${q.name}`}>
+                <Box
+                  sx={{ display: "flex", alignItems: "center", gap: 1, mb: 1 }}
+                >
+                  <TerminalIcon fontSize="small" color="action" />
+                  <Typography
+                    variant="caption"
+                    sx={{ fontWeight: 600, color: "text.secondary" }}
+                  >
+                    SQL QUERY · {q.name}
+                  </Typography>
+                </Box>
+                <Box
+                  component="div"
+                  sx={{
+                    bgcolor: "grey.900",
+                    color: "grey.100",
+                    p: 2,
+                    borderRadius: 2,
+                    fontFamily: "monospace",
+                    fontSize: "0.8rem",
+                    overflowX: "auto",
+                    border: "1px solid",
+                    borderColor: "grey.800",
+                  }}
+                >
+                  {q.sql}
+                </Box>
+              </Box>
+            ))}
+
             {parsedPlan.final_analysis && (
               <Box
                 sx={{
@@ -259,4 +303,4 @@ export const MessageBubble: React.FC<MessageBubbleProps> = ({ message }) => {
       </Paper>
     </Box>
   );
-};
+});
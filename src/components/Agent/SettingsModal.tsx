@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from "react";
 import type { InvestigationConfig } from "../../types/agent";
+import { DEFAULT_MODEL } from "../../lib/agent/openai";
 import {
   Dialog,
   DialogTitle,
@@ -10,6 +11,8 @@ import {
   Typography,
   Box,
   Alert,
+  FormControlLabel,
+  Switch,
 } from "@mui/material";
 
 interface SettingsModalProps {
@@ -27,12 +30,18 @@ export const SettingsModal: React.FC<SettingsModalProps> = ({
 }) => {
   const [apiKey, setApiKey] = useState(config.openaiApiKey || "");
   const [apiBase, setApiBase] = useState(config.openaiApiBase || "");
-  const [model, setModel] = useState(config.openaiModel || "gpt-4o");
+  const [model, setModel] = useState(config.openaiModel || DEFAULT_MODEL);
+  const [finalModel, setFinalModel] = useState(config.openaiFinalModel || "");
+  const [responsesApi, setResponsesApi] = useState(
+    config.openaiResponsesApi || false,
+  );
 
   useEffect(() => {
     setApiKey(config.openaiApiKey || "");
     setApiBase(config.openaiApiBase || "");
-    setModel(config.openaiModel || "gpt-5.1-mini");
+    setModel(config.openaiModel || DEFAULT_MODEL);
+    setFinalModel(config.openaiFinalModel || "");
+    setResponsesApi(config.openaiResponsesApi || false);
   }, [config, isOpen]);
 
   const handleSave = () => {
@@ -41,6 +50,8 @@ export const SettingsModal: React.FC<SettingsModalProps> = ({
       openaiApiKey: apiKey,
       openaiApiBase: apiBase,
       openaiModel: model,
+      openaiFinalModel: finalModel,
+      openaiResponsesApi: responsesApi,
     });
     onClose();
   };
@@ -86,10 +97,37 @@ export const SettingsModal: React.FC<SettingsModalProps> = ({
             variant="outlined"
             value={model}
             onChange={(e) => setModel(e.target.value)}
-            placeholder="gpt-4o"
-            helperText="OpenAI model to use (e.g., gpt-4o, gpt-4-turbo, gpt-3.5-turbo)"
+            placeholder={DEFAULT_MODEL}
+            helperText="OpenAI model to use (e.g., gpt-4o-mini, gpt-4o, gpt-4.1)"
           />
 
+          <TextField
+            margin="dense"
+            label="Escalation Model"
+            type="text"
+            fullWidth
+            variant="outlined"
+            value={finalModel}
+            onChange={(e) => setFinalModel(e.target.value)}
+            placeholder="gpt-4.1"
+            helperText="Optional. Used for turns expected to conclude and retries after a malformed plan."
+          />
+
+          <FormControlLabel
+            sx={{ mt: 1 }}
+            control={
+              <Switch
+                checked={responsesApi}
+                onChange={(e) => setResponsesApi(e.target.checked)}
+              />
+            }
+            label="Use Responses API"
+          />
+          <Typography variant="caption" color="text.secondary" display="block">
+            Keeps conversation state on the server so only new messages are
+            sent each turn. Requires an endpoint that supports /responses.
+          </Typography>
+
           {!apiKey && (
             <Alert severity="warning" sx={{ mt: 2 }}>
               An OpenAI API Key is required for the agent to function.
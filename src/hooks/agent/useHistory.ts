@@ -1,5 +1,6 @@
 import { useState, useEffect, useCallback } from "react";
 import type { Message } from "../../types/agent";
+import { memoPerMessage } from "../../lib/agent/utils";
 
 export interface SavedSession {
   id: string;
@@ -10,6 +11,20 @@ export interface SavedSession {
 
 const STORAGE_KEY = "kabinet_agent_sessions";
 
+// Saving after every message then encodes the new messages, not every
+// stored session and query result again
+const serializeMessage = memoPerMessage((message: Message) =>
+  JSON.stringify(message),
+);
+
+const serializeSessions = (sessions: SavedSession[]) =>
+  `[${sessions
+    .map(
+      ({ messages, ...meta }) =>
+        `${JSON.stringify(meta).slice(0, -1)},"messages":[${messages.map(serializeMessage).join(",")}]}`,
+    )
+    .join(",")}]`;
+
 export const useHistory = () => {
   const [sessions, setSessions] = useState<SavedSession[]>([]);
 
@@ -38,7 +53,7 @@ export const useHistory = () => {
       // Sort by timestamp desc
       next.sort((a, b) => b.timestamp - a.timestamp);
 
-      localStorage.setItem(STORAGE_KEY, JSON.stringify(next));
+      localStorage.setItem(STORAGE_KEY, serializeSessions(next));
       return next;
     });
   }, []);
@@ -46,7 +61,7 @@ export const useHistory = () => {
   const deleteSession = useCallback((id: string) => {
     setSessions((prev) => {
       const next = prev.filter((s) => s.id !== id);
-      localStorage.setItem(STORAGE_KEY, JSON.stringify(next));
+      localStorage.setItem(STORAGE_KEY, serializeSessions(next));
       return next;
     });
   }, []);
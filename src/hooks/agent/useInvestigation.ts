@@ -4,11 +4,55 @@ import type {
   InvestigationConfig,
   InvestigationStatus,
   AgentPlan,
+  QueryResult,
 } from "../../types/agent";
 import { useHistory, type SavedSession } from "./useHistory";
-import { createOpenAIClient } from "../../lib/agent/openai";
-import { executeKubeQuery } from "../../lib/agent/kube";
-import { SYSTEM_PROMPT } from "../../lib/agent/prompts";
+import {
+  createOpenAIClient,
+  cachePlan,
+  DEFAULT_MODEL,
+  isPreviousResponseNotFound,
+  planCacheKey,
+  replayCachedPlan,
+  streamPlanCompletion,
+  streamPlanResponse,
+  toWireMessage,
+} from "../../lib/agent/openai";
+import { executeKubeQueries, executeKubeQuery } from "../../lib/agent/kube";
+import { checkPlan, checkProbeMember } from "../../lib/agent/schema";
+import {
+  ANSWER_ONLY_MESSAGE,
+  ANSWER_ONLY_PROMPT,
+  EXAMPLES_INSTRUCTIONS,
+  EXAMPLES_MESSAGE,
+  SYSTEM_MESSAGE,
+  SYSTEM_PROMPT,
+} from "../../lib/agent/prompts";
+import {
+  buildContext,
+  condenseHistory,
+  type Condensation,
+} from "../../lib/agent/context";
+import {
+  compactResult,
+  compactResults,
+  findResult,
+  isInformationalQuestion,
+  isResultBatch,
+  nextResultId,
+  parsePlan,
+  preconnect,
+  SAMPLE_ROWS,
+  SAMPLE_STR_CAP,
+  timeHintMessage,
+} from "../../lib/agent/utils";
+
+// Confidence at which a hypothesis repeated on consecutive turns is final
+const CONCLUDE_CONFIDENCE = 0.9;
+
+// Keys of a single QueryResult; a batch probe named after one would make
+// the batch look like a single result
+const RESERVED_PROBE_NAMES = new Set(["results", "error"]);
 
 export const useInvestigation = (config: InvestigationConfig) => {
   const [messages, setMessages] = useState<Message[]>([]);
@@ -23,6 +67,10 @@ export const useInvestigation = (config: InvestigationConfig) => {
   // Refs to access latest state in async loop without dependency issues
   const messagesRef = useRef<Message[]>([]);
   const stopRef = useRef<boolean>(false);
+  // Responses API chaining: last stored response and how many messages it covers
+  const responseStateRef = useRef<{ id?: string; sent: number }>({ sent: 0 });
+  // Chat Completions path: summary of messages that left the hot window
+  const condensationRef = useRef<Condensation | undefined>(undefined);
 
   // History management
   const { saveSession } = useHistory();
@@ -45,12 +93,24 @@ export const useInvestigation = (config: InvestigationConfig) => {
     }
   }, [messages, sessionId, saveSession]);
 
+  // Warms up connections and the client while the user is still typing.
+  // Called on load and again from the input, since idle sockets get closed.
+  const warmUp = useCallback(() => {
+    if (!config.openaiApiKey) return;
+    preconnect(config.openaiApiBase || "https://api.openai.com/v1");
+    preconnect(config.kubeApiUrl);
+    createOpenAIClient(config);
+  }, [config]);
+
+  useEffect(warmUp, [warmUp]);
+
+  // The ref is updated right away: the loop may read it again before React
+  // runs a state updater, e.g. after two messages are added back to back.
+  // Messages are frozen, so per-message caches (memoPerMessage) stay valid.
   const addMessage = (msg: Message) => {
-    setMessages((prev) => {
-      const next = [...prev, msg];
-      messagesRef.current = next;
-      return next;
-    });
+    const next = [...messagesRef.current, Object.freeze(msg)];
+    messagesRef.current = next;
+    setMessages(next);
   };
 
   const stop = useCallback(() => {
@@ -62,6 +122,8 @@ export const useInvestigation = (config: InvestigationConfig) => {
     stop();
     setMessages([]);
     messagesRef.current = [];
+    responseStateRef.current = { sent: 0 };
+    condensationRef.current = undefined;
     setStatus("idle");
     setCurrentHypothesis("");
     setCurrentThought("");
@@ -72,9 +134,18 @@ export const useInvestigation = (config: InvestigationConfig) => {
   const loadSession = useCallback(
     (session: SavedSession) => {
       stop();
+      // Stored sessions carry their own copy of the system prompt; point them
+      // back at the shared message so its precomputed token count is used
+      const messages =
+        session.messages[0]?.content === SYSTEM_PROMPT
+          ? [SYSTEM_MESSAGE, ...session.messages.slice(1)]
+          : session.messages;
+      messages.forEach((m) => Object.freeze(m));
       setSessionId(session.id);
-      setMessages(session.messages);
-      messagesRef.current = session.messages;
+      setMessages(messages);
+      messagesRef.current = messages;
+      responseStateRef.current = { sent: 0 };
+      condensationRef.current = undefined;
       setStatus("idle"); // Or 'complete' depending on state, but idle is safer for now
       setCurrentHypothesis("");
       setCurrentThought("");
@@ -98,19 +169,17 @@ export const useInvestigation = (config: InvestigationConfig) => {
       setCurrentQuery(undefined);
 
       let currentMessages = messagesRef.current;
+      const userMessage: Message = Object.freeze({
+        role: "user",
+        content: userProblem,
+      });
 
       if (currentMessages.length === 0) {
         // New session
-        currentMessages = [
-          { role: "system", content: SYSTEM_PROMPT },
-          { role: "user", content: userProblem },
-        ];
+        currentMessages = [SYSTEM_MESSAGE, userMessage];
       } else {
         // Continuing session
-        currentMessages = [
-          ...currentMessages,
-          { role: "user", content: userProblem },
-        ];
+        currentMessages = [...currentMessages, userMessage];
       }
 
       // Update state with new messages
@@ -120,6 +189,115 @@ export const useInvestigation = (config: InvestigationConfig) => {
       const client = createOpenAIClient(config);
       let turn = 0;
       const maxTurns = 15;
+      // Condensation started while the previous turn's probes were running
+      let precondensed: Promise<Condensation | undefined> | undefined;
+      // Set once a plan failed to parse; later turns use the escalation model
+      let escalated = false;
+      // Previous plan, for the early-exit stability check
+      let lastPlan: AgentPlan | undefined;
+      let concludeRequested = false;
+      // Set for the turn that answers a conclude request
+      let concludeNext = false;
+
+      // A hypothesis held with high confidence for two turns needs no more
+      // probes; the agent asks for the conclusion instead
+      const confident = (p?: Pick<AgentPlan, "confidence">) =>
+        (p?.confidence ?? 0) >= CONCLUDE_CONFIDENCE;
+      const isSettled = (p: Pick<AgentPlan, "hypothesis" | "confidence">) =>
+        !concludeRequested &&
+        confident(p) &&
+        confident(lastPlan) &&
+        p.hypothesis === lastPlan?.hypothesis;
+
+      // Only a sample of each result enters the context; the rest is kept on
+      // the message and can be recalled by its handle
+      const recallHint = (id: string) =>
+        `Stored as ${id}. Set "recall": "${id}" to see more rows.`;
+
+      // Dispatches the plan's probes and builds the observation message
+      const runProbes = async (
+        plan: AgentPlan,
+      ): Promise<Message | undefined> => {
+        if (plan.queries?.length) {
+          const probes = plan.queries;
+          setStatus("querying");
+          setCurrentQuery({
+            sql: probes.map((q) => `-- ${q.name}\n${q.sql}`).join("\n\n"),
+            start: probes[0].start,
+            end: probes[0].end,
+          });
+          const results = await executeKubeQueries(config, probes);
+
+          // Key by the AI-provided name, disambiguating duplicates and the
+          // single-result keys isResultBatch tells batches apart by
+          const byName: Record<string, QueryResult> = {};
+          probes.forEach((q, i) => {
+            const name =
+              q.name &&
+              !RESERVED_PROBE_NAMES.has(q.name) &&
+              !(q.name in byName)
+                ? q.name
+                : `query_${i + 1}`;
+            byName[name] = results[i];
+          });
+
+          const resultId = nextResultId(messagesRef.current);
+          return {
+            role: "system",
+            content: `Query executed. Result:\n${compactResults(byName, SAMPLE_ROWS, SAMPLE_STR_CAP)}\n${recallHint(resultId)}`,
+            result: byName,
+            resultId,
+          };
+        }
+
+        if (plan.query) {
+          setStatus("querying");
+          setCurrentQuery(plan.query);
+          const result = await executeKubeQuery(
+            config,
+            plan.query.sql,
+            plan.query.start,
+            plan.query.end,
+          );
+
+          const resultId = nextResultId(messagesRef.current);
+          return {
+            role: "system",
+            content: `Query executed. Result:\n${compactResult(result, SAMPLE_ROWS, SAMPLE_STR_CAP)}\n${recallHint(resultId)}`,
+            result,
+            resultId,
+          };
+        }
+
+        if (plan.recall) {
+          const result = findResult(messagesRef.current, plan.recall);
+          if (!result) {
+            return {
+              role: "system",
+              content: `No stored result ${plan.recall}. Run a query instead.`,
+            };
+          }
+          return {
+            role: "system",
+            content: `Query executed. Result:\n${isResultBatch(result) ? compactResults(result) : compactResult(result)}`,
+            result,
+          };
+        }
+
+        return undefined;
+      };
+
+      // Probes started as soon as their member closes in the stream, so the
+      // analyzer round-trip overlaps with the rest of the generation
+      const early: { probes?: Promise<Message | undefined> } = {};
+      // For paths that end the turn without using an early probe: its result
+      // is dropped and the query display is cleared
+      const discardEarly = () => {
+        if (!early.probes) return;
+        early.probes.catch(() => undefined);
+        early.probes = undefined;
+        setCurrentQuery(undefined);
+      };
 
       try {
         while (turn < maxTurns && !stopRef.current) {
@@ -127,26 +305,186 @@ export const useInvestigation = (config: InvestigationConfig) => {
           setStatus("planning");
 
           // Prepare context for AI
-          const currentTime = new Date().toISOString();
-          const contextMessages = [
-            ...messagesRef.current,
-            {
+          const timeMessage = timeHintMessage();
+          const concluding = concludeNext;
+          concludeNext = false;
+          // The last allowed turn must conclude; say so, since its probes
+          // would never be analyzed
+          const lastTurn = turn === maxTurns;
+          if (lastTurn && !concluding) {
+            addMessage({
               role: "system",
-              content: `The current UTC time is ${currentTime}. Use this to construct your query's time range.`,
-            },
-          ] as any[]; // Type cast for OpenAI SDK compatibility
+              content:
+                "This is the last turn of the investigation. Conclude now with final_analysis based on the results so far; do not query further.",
+            });
+          }
+          // Routing turns run on the fast model. Turns expected to conclude go
+          // to the escalation model when one is set.
+          const model =
+            ((escalated || concluding || lastTurn) &&
+              config.openaiFinalModel) ||
+            config.openaiModel ||
+            DEFAULT_MODEL;
+          // Appends the time hint in place to an array built for this request,
+          // avoiding another copy of the whole context
+          const withTime = (msgs: Message[]) => {
+            msgs.push(timeMessage);
+            return msgs;
+          };
+          // Worked examples only accompany the opening plan of a session
+          const firstPlan = messagesRef.current.length === 2;
+          // General questions get one short answer-only request instead of
+          // the full investigation prompt
+          const answerOnly = firstPlan && isInformationalQuestion(userProblem);
+          const examples = firstPlan && !answerOnly;
+
+          // Thought and hypothesis come first in the plan, so they are shown
+          // while the query or final analysis is still being generated.
+          // Hypothesis and confidence also precede the probes, so a settled
+          // plan is recognized before its probe would be dispatched.
+          const streamed: Pick<AgentPlan, "hypothesis" | "confidence"> = {};
+          const onMember = (key: string, value: string) => {
+            const isProbe = key === "query" || key === "queries";
+            const isReasoning =
+              key === "thought" || key === "hypothesis" || key === "confidence";
+            if (isProbe ? early.probes : !isReasoning) return;
+            let parsed;
+            try {
+              parsed = JSON.parse(value);
+            } catch {
+              // Malformed member; the full plan is parsed after the stream
+              return;
+            }
+            if (isProbe) {
+              // Off-contract probes wait for the full plan to be rejected
+              if (checkProbeMember(key, parsed)) return;
+              if (lastTurn || isSettled(streamed)) return;
+              early.probes = runProbes(
+                key === "query" ? { query: parsed } : { queries: parsed },
+              );
+            } else if (key === "confidence") {
+              if (typeof parsed === "number") streamed.confidence = parsed;
+            } else if (typeof parsed === "string" && parsed) {
+              if (key === "thought") {
+                setCurrentThought(parsed);
+              } else {
+                streamed.hypothesis = parsed;
+                setCurrentHypothesis(parsed);
+              }
+            }
+          };
 
           // 1. Get AI Plan
-          const completion = await client.chat.completions.create({
-            model: config.openaiModel || "gpt-4o",
-            messages: contextMessages,
-            response_format: { type: "json_object" },
-          });
+          let content: string;
+          // Set when this turn's plan may be stored for replay
+          let planKey: string | undefined;
+          const chainState = responseStateRef.current;
+          if (config.openaiResponsesApi) {
+            // The system prompt travels as `instructions`, not as input, and
+            // so do the examples: input items stay in the stored chain. The
+            // time hints do stay in it, at a few tokens per turn, since
+            // putting them in `instructions` would break the cached prefix.
+            const history = messagesRef.current;
+            const { id, sent } = responseStateRef.current;
+            const send = (previousResponseId?: string, from = 1) =>
+              streamPlanResponse(
+                client,
+                {
+                  model,
+                  instructions: answerOnly
+                    ? ANSWER_ONLY_PROMPT
+                    : examples
+                      ? EXAMPLES_INSTRUCTIONS
+                      : SYSTEM_PROMPT,
+                  input: withTime(history.slice(from)),
+                  previousResponseId,
+                },
+                onMember,
+              );
+
+            let response;
+            try {
+              response = id ? await send(id, sent) : await send();
+            } catch (e) {
+              if (!id || !isPreviousResponseNotFound(e)) throw e;
+              // Stored response expired; resend the whole conversation
+              response = await send();
+            }
+            content = response.content;
+            // The assistant reply appended below is already stored server-side
+            responseStateRef.current = {
+              id: response.id,
+              sent: history.length + 1,
+            };
+          } else {
+            // Bound the request body by condensing messages that left the
+            // hot window instead of resending the whole investigation
+            if (precondensed) condensationRef.current = await precondensed;
+            precondensed = undefined;
+            // A failed summary keeps the previous one rather than ending the
+            // investigation; the next turn tries again
+            const previous = condensationRef.current;
+            condensationRef.current = await condenseHistory(
+              client,
+              model,
+              messagesRef.current,
+              previous,
+            ).catch((e) => {
+              console.error("History condensation failed:", e);
+              return previous;
+            });
+            const history = buildContext(
+              messagesRef.current,
+              condensationRef.current,
+            );
+
+            // Strip display-only fields such as `result` before sending
+            const contextMessages = withTime(history.map(toWireMessage));
+            if (answerOnly) contextMessages[0] = ANSWER_ONLY_MESSAGE;
+            else if (examples) contextMessages.splice(1, 0, EXAMPLES_MESSAGE);
+
+            planKey = await planCacheKey(model, contextMessages);
+            content =
+              (planKey && replayCachedPlan(planKey, onMember)) ||
+              (await streamPlanCompletion(
+                client,
+                {
+                  model,
+                  messages: contextMessages,
+                },
+                onMember,
+              ));
+          }
 
-          const content = completion.choices[0].message.content;
           if (!content) throw new Error("Empty response from AI");
 
-          const plan: AgentPlan = JSON.parse(content);
+          let plan: AgentPlan;
+          try {
+            plan = parsePlan(content);
+          } catch (e) {
+            // Retry the turn on the escalation model rather than failing the
+            // whole investigation, and keep the unusable reply out of the chain
+            if (escalated || !config.openaiFinalModel) throw e;
+            escalated = true;
+            responseStateRef.current = chainState;
+            discardEarly();
+            continue;
+          }
+
+          // Off-contract plans are sent back with the reason instead of
+          // being half-executed
+          const problem = checkPlan(plan);
+          if (problem) {
+            discardEarly();
+            addMessage({ role: "assistant", content });
+            addMessage({
+              role: "system",
+              content: `Your last response was rejected (${problem}). Respond with a plan in the required JSON structure.`,
+            });
+            continue;
+          }
+
+          if (planKey) cachePlan(planKey, content);
 
           // Update UI with AI's thought process
           addMessage({ role: "assistant", content: content }); // Store raw JSON for history
@@ -155,29 +493,54 @@ export const useInvestigation = (config: InvestigationConfig) => {
 
           // 2. Check for conclusion
           if (plan.final_analysis) {
+            discardEarly();
             setStatus("complete");
             return;
           }
 
-          // 3. Execute Query
-          if (plan.query) {
-            setStatus("querying");
-            setCurrentQuery(plan.query);
-            const result = await executeKubeQuery(
-              config,
-              plan.query.sql,
-              plan.query.start,
-              plan.query.end,
-            );
-
-            setStatus("analyzing");
-            setCurrentQuery(undefined);
-            const summary = JSON.stringify(result, null, 2);
+          // Probes on the last turn could not be analyzed any more
+          if (lastTurn) {
+            discardEarly();
+            break;
+          }
 
+          // Settled: skip this plan's probes and ask for the conclusion, on
+          // the escalation model like any concluding turn
+          const settled = isSettled(plan);
+          lastPlan = plan;
+          if (settled) {
+            concludeRequested = true;
+            concludeNext = true;
+            discardEarly();
             addMessage({
               role: "system",
-              content: `Query executed. Result:\n${summary}`,
+              content:
+                "Your hypothesis has held with high confidence for two turns. Conclude now with final_analysis instead of querying further.",
             });
+            continue;
+          }
+
+          // The observation lands in the hot window, so older turns can be
+          // condensed for the next request while the analyzer is busy. A
+          // failure keeps the old summary; the next turn retries it.
+          if (!config.openaiResponsesApi) {
+            const previous = condensationRef.current;
+            precondensed = condenseHistory(
+              client,
+              model,
+              messagesRef.current,
+              previous,
+            ).catch(() => previous);
+          }
+
+          // 3. Execute Query (possibly already started during streaming)
+          const pending = early.probes;
+          early.probes = undefined;
+          const observation = await (pending ?? runProbes(plan));
+          if (observation) {
+            setStatus("analyzing");
+            setCurrentQuery(undefined);
+            addMessage(observation);
           } else {
             // Fallback if no query and no conclusion (shouldn't happen with good prompt)
             addMessage({
@@ -193,6 +556,7 @@ export const useInvestigation = (config: InvestigationConfig) => {
           setStatus("complete");
         }
       } catch (error: any) {
+        discardEarly();
         console.error("Investigation error:", error);
         addMessage({ role: "system", content: `Error: ${error.message}` });
         setStatus("error");
@@ -209,6 +573,7 @@ export const useInvestigation = (config: InvestigationConfig) => {
     currentQuery,
     start,
     stop,
+    warmUp,
     clearSession,
     loadSession,
   };
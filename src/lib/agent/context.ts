@@ -0,0 +1,116 @@
+import type OpenAI from "openai";
+import type { Message } from "../../types/agent";
+import { CONTEXT_TOKEN_BUDGET, contextTokens } from "./tokens";
+import { parsePlan } from "./utils";
+
+// Messages kept verbatim at the end of the context
+export const HOT_WINDOW = 6;
+// History length (including the system prompt) at which condensation starts
+const CONDENSE_THRESHOLD = 8;
+// Only re-condense once this many messages have left the hot window
+const RECONDENSE_STEP = 4;
+const CONDENSE_MAX_TOKENS = 200;
+// Observations and other messages are clipped to this in the log
+const LOG_LINE_CHARS = 200;
+
+const CONDENSE_PROMPT = `You condense the log of a Kubernetes event investigation.
+Write a short plain-text summary of the user's question, the hypotheses tested, the queries run and their key findings (names, counts, timestamps).
+Keep facts the investigation may still need. Do not add recommendations.`;
+
+export interface Condensation {
+  // History index up to which (exclusive) messages are covered by the summary
+  upTo: number;
+  summary: string;
+}
+
+/**
+ * Returns an updated condensation of everything before the hot window, or the
+ * given one unchanged if the cold part has not grown enough to redo it. Only
+ * messages that left the hot window since the last run are sent, together
+ * with the previous summary. A context over CONTEXT_TOKEN_BUDGET is always
+ * condensed, whatever its length.
+ */
+export const condenseHistory = async (
+  client: OpenAI,
+  model: string,
+  history: Message[],
+  previous?: Condensation,
+): Promise<Condensation | undefined> => {
+  const overBudget =
+    contextTokens(buildContext(history, previous)) > CONTEXT_TOKEN_BUDGET;
+  if (history.length <= CONDENSE_THRESHOLD && !overBudget) return previous;
+
+  const coldEnd = history.length - HOT_WINDOW;
+  const from = previous?.upTo ?? 1; // history[0] is the system prompt
+  if (coldEnd <= from) return previous;
+  if (coldEnd - from < RECONDENSE_STEP && !overBudget) return previous;
+
+  const log = history
+    .slice(from, coldEnd)
+    .map((m) => `[${m.role}] ${m.content}`)
+    .join("\n\n");
+  const completion = await client.chat.completions.create({
+    model,
+    max_completion_tokens: CONDENSE_MAX_TOKENS,
+    messages: [
+      { role: "system", content: CONDENSE_PROMPT },
+      {
+        role: "user",
+        content: previous
+          ? `Summary so far:\n${previous.summary}\n\nNew log entries:\n${log}`
+          : log,
+      },
+    ],
+  });
+
+  const summary = completion.choices[0]?.message.content;
+  if (!summary) return previous;
+  return { upTo: coldEnd, summary };
+};
+
+// One line of the investigation log, built without an LLM call. Questions
+// stay verbatim; results keep their handle so they can still be recalled.
+const logLine = (message: Message): string => {
+  if (message.role === "user") return `[user] ${message.content}`;
+  if (message.role === "assistant") {
+    try {
+      const plan = parsePlan(message.content);
+      const sql = plan.query
+        ? [plan.query.sql]
+        : (plan.queries ?? []).map((q) => q.sql);
+      return `[plan] ${plan.hypothesis ?? ""}${sql.length ? ` | ${sql.join(" ; ")}` : ""}`;
+    } catch {
+      // Not a plan; fall through to a clipped copy
+    }
+  }
+  const label = message.resultId ? `result ${message.resultId}` : message.role;
+  return `[${label}] ${message.content.slice(0, LOG_LINE_CHARS)}`;
+};
+
+// Builds the messages sent to the model: system prompt, condensed history,
+// a one-line-per-message log of whatever else left the hot window, then the
+// hot window verbatim.
+export const buildContext = (
+  history: Message[],
+  condensation?: Condensation,
+): Message[] => {
+  const from = condensation?.upTo ?? 1;
+  const hotStart = Math.max(from, history.length - HOT_WINDOW);
+  if (!condensation && hotStart <= from) return history;
+
+  const context: Message[] = [history[0]];
+  if (condensation) {
+    context.push({
+      role: "system",
+      content: `Condensed history: ${condensation.summary}`,
+    });
+  }
+  if (hotStart > from) {
+    context.push({
+      role: "system",
+      content: `Investigation log:\n${history.slice(from, hotStart).map(logLine).join("\n")}`,
+    });
+  }
+  for (let i = hotStart; i < history.length; i++) context.push(history[i]);
+  return context;
+};
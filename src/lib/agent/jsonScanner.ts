@@ -0,0 +1,70 @@
+/**
+ * Creates an incremental scanner for a streamed JSON object.
+ *
+ * Each call consumes the next chunk of text and returns the offset (relative
+ * to the start of the whole stream) just past the closing brace of the
+ * top-level object, or -1 while the object is still open. String contents and
+ * escapes are tracked so braces inside values are ignored.
+ *
+ * When `onMember` is given, it is called with the key and raw JSON text of
+ * each top-level member as soon as that member is complete, so callers can
+ * act on early fields before the rest of the object has been generated.
+ */
+export const createJsonObjectScanner = (
+  onMember?: (key: string, value: string) => void,
+) => {
+  let text = "";
+  let depth = 0;
+  let inString = false;
+  let escaped = false;
+  let stringStart = -1;
+  let key = "";
+  let valueStart = -1;
+
+  const emit = (valueEnd: number) => {
+    if (onMember && valueStart >= 0) {
+      onMember(key, text.slice(valueStart, valueEnd).trim());
+    }
+    valueStart = -1;
+  };
+
+  return (chunk: string): number => {
+    const offset = text.length;
+    text += chunk;
+
+    for (let i = offset; i < text.length; i++) {
+      const ch = text[i];
+      if (inString) {
+        if (escaped) escaped = false;
+        else if (ch === "\\") escaped = true;
+        else if (ch === '"') {
+          inString = false;
+          // A string at depth 1 before the colon is a member key
+          if (depth === 1 && valueStart < 0) {
+            key = text.slice(stringStart + 1, i);
+          }
+        }
+        continue;
+      }
+      if (depth === 0) {
+        if (ch === "{") depth = 1;
+        continue;
+      }
+      if (ch === '"') {
+        inString = true;
+        stringStart = i;
+      } else if (ch === "{" || ch === "[") depth++;
+      else if (ch === "}" || ch === "]") {
+        depth--;
+        if (depth === 0) {
+          emit(i);
+          return i + 1;
+        }
+      } else if (depth === 1) {
+        if (ch === ":") valueStart = i + 1;
+        else if (ch === ",") emit(i);
+      }
+    }
+    return -1;
+  };
+};
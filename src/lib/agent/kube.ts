@@ -1,5 +1,100 @@
-import type { QueryResult } from "../../types/agent";
+import type { PlanQuery, QueryResult } from "../../types/agent";
 import type { InvestigationConfig } from "../../types/agent";
+import { checkQuery, DEFAULT_LIMIT } from "./sql";
+
+// Built once; the browser reuses pooled keep-alive connections per origin.
+const QUERY_HEADERS: HeadersInit = {
+  "Content-Type": "application/json",
+};
+
+const QUERY_TIMEOUT_MS = 30_000;
+const MAX_RETRIES = 2;
+const RETRY_BACKOFF_MS = 200;
+const RETRY_STATUSES = new Set([502, 503, 504]);
+const MAX_CONCURRENT_QUERIES = 4;
+
+const sleep = (ms: number) => new Promise((r) => setTimeout(r, ms));
+
+// Investigations often repeat drill-down queries across turns. Map iteration
+// order is insertion order, so the first key is always the oldest entry.
+const CACHE_MAX_ENTRIES = 64;
+const CACHE_TTL_MS = 60_000;
+
+// A window that closed this long ago is treated as settled: its rows no
+// longer change, so the result is kept without TTL and survives reloads.
+const SETTLED_AFTER_MS = 5 * 60_000;
+const CACHE_STORAGE_KEY = "kabinet_query_cache";
+const PERSIST_MAX_ENTRIES = 32;
+const PERSIST_MAX_CHARS = 32_768;
+
+interface CacheEntry {
+  at: number;
+  result: QueryResult;
+  settled: boolean;
+  // Serialized form, kept only for settled results small enough to persist
+  json?: string;
+}
+
+const queryCache = new Map<string, CacheEntry>();
+
+try {
+  const stored = localStorage.getItem(CACHE_STORAGE_KEY);
+  if (stored) {
+    for (const [key, json] of JSON.parse(stored) as [string, string][]) {
+      queryCache.set(key, {
+        at: 0,
+        result: JSON.parse(json),
+        settled: true,
+        json,
+      });
+    }
+  }
+} catch (e) {
+  console.error("Failed to load query cache:", e);
+}
+
+const persistCache = () => {
+  const entries: [string, string][] = [];
+  for (const [key, entry] of queryCache) {
+    if (entry.json) entries.push([key, entry.json]);
+  }
+  try {
+    localStorage.setItem(
+      CACHE_STORAGE_KEY,
+      JSON.stringify(entries.slice(-PERSIST_MAX_ENTRIES)),
+    );
+  } catch {
+    // Quota exceeded; the in-memory cache still works
+  }
+};
+
+// Cached results are shared between callers and must not be mutated
+const cacheGet = (key: string): QueryResult | undefined => {
+  const entry = queryCache.get(key);
+  if (!entry) return undefined;
+  if (!entry.settled && Date.now() - entry.at >= CACHE_TTL_MS) {
+    queryCache.delete(key);
+    return undefined;
+  }
+  // Refresh recency
+  queryCache.delete(key);
+  queryCache.set(key, entry);
+  return entry.result;
+};
+
+const cacheSet = (key: string, end: string, result: QueryResult) => {
+  const settled = Date.parse(end) < Date.now() - SETTLED_AFTER_MS;
+  const entry: CacheEntry = { at: Date.now(), result, settled };
+  if (settled) {
+    const json = JSON.stringify(result);
+    if (json.length <= PERSIST_MAX_CHARS) entry.json = json;
+  }
+  queryCache.set(key, entry);
+  if (queryCache.size > CACHE_MAX_ENTRIES) {
+    queryCache.delete(queryCache.keys().next().value!);
+  }
+  if (entry.json) persistCache();
+};
 
 export const executeKubeQuery = async (
   config: InvestigationConfig,
@@ -7,29 +102,85 @@ export const executeKubeQuery = async (
   start: string,
   end: string,
 ): Promise<QueryResult> => {
+  const check = checkQuery(query, start, end);
+  if (check.error !== undefined) {
+    return { error: `SQL rejected locally: ${check.error}` };
+  }
+
+  // Scoped to the analyzer: another cluster's rows must never be returned
+  const key = `${config.kubeApiUrl}\u0000${query.trim()}\u0000${start}\u0000${end}`;
+  const cached = cacheGet(key);
+  if (cached) {
+    console.log(`[KubeClient] Cache hit: ${query} (${start} - ${end})`);
+    return cached;
+  }
+
   console.log(`[KubeClient] Executing query: ${query} (${start} - ${end})`);
 
+  const body = JSON.stringify({ query: check.sql, start, end });
+
   try {
-    const response = await fetch(config.kubeApiUrl, {
-      method: "POST",
-      headers: {
-        "Content-Type": "application/json",
-      },
-      body: JSON.stringify({
-        query,
-        start,
-        end,
-      }),
-    });
-
-    if (!response.ok) {
-      const text = await response.text();
-      return { error: `API call failed: ${response.status} ${text}` };
-    }
+    for (let attempt = 0; ; attempt++) {
+      const response = await fetch(config.kubeApiUrl, {
+        method: "POST",
+        headers: QUERY_HEADERS,
+        body,
+        signal: AbortSignal.timeout(QUERY_TIMEOUT_MS),
+      });
 
-    const data = await response.json();
-    return data;
+      // Transient gateway errors are retried with exponential backoff
+      if (RETRY_STATUSES.has(response.status) && attempt < MAX_RETRIES) {
+        await sleep(RETRY_BACKOFF_MS * 2 ** attempt);
+        continue;
+      }
+
+      if (!response.ok) {
+        const text = await response.text();
+        return { error: `API call failed: ${response.status} ${text}` };
+      }
+
+      // Only rows reach the agent. The per-query file list and timings are
+      // dropped here so they are never cached, persisted or kept in history.
+      const { results, error }: QueryResult = await response.json();
+      if (error) return { error };
+      const data: QueryResult =
+        check.limitApplied && results && results.length >= DEFAULT_LIMIT
+          ? { results, limited: DEFAULT_LIMIT }
+          : { results };
+      cacheSet(key, end, data);
+      return data;
+    }
   } catch (e: any) {
+    if (e.name === "TimeoutError") {
+      return { error: `Query timed out after ${QUERY_TIMEOUT_MS / 1000}s` };
+    }
     return { error: `Network error: ${e.message}` };
   }
 };
+
+/**
+ * Runs independent queries concurrently, at most MAX_CONCURRENT_QUERIES at a
+ * time, and returns their results in input order.
+ */
+export const executeKubeQueries = async (
+  config: InvestigationConfig,
+  queries: PlanQuery[],
+): Promise<QueryResult[]> => {
+  const results: QueryResult[] = new Array(queries.length);
+  let next = 0;
+  const worker = async () => {
+    while (next < queries.length) {
+      const i = next++;
+      const { sql, start, end } = queries[i];
+      results[i] = await executeKubeQuery(config, sql, start, end);
+    }
+  };
+
+  await Promise.all(
+    Array.from(
+      { length: Math.min(MAX_CONCURRENT_QUERIES, queries.length) },
+      worker,
+    ),
+  );
+  return results;
+};
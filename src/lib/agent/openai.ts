@@ -1,14 +1,212 @@
 import OpenAI from "openai";
-import type { InvestigationConfig } from "../../types/agent";
+import type { ChatCompletionCreateParamsStreaming } from "openai/resources/chat/completions";
+import type { InvestigationConfig, Message } from "../../types/agent";
+import { createJsonObjectScanner } from "./jsonScanner";
+import { PLAN_SCHEMA, PLAN_SCHEMA_NAME } from "./schema";
+import { memoPerMessage } from "./utils";
 
+// Small models handle SQL planning well and decode several times faster
+export const DEFAULT_MODEL = "gpt-4o-mini";
+
+// Upper bound on plan output. A query turn is a few hundred tokens; the cap
+// leaves room for a final analysis with a data table so it is not cut off.
+export const PLAN_MAX_TOKENS = 2048;
+
+// Plan requests share the system prompt as their prefix. A fixed cache key
+// routes them to the same prompt-cache shard across turns and sessions; the
+// per-turn time hint is always sent last so it never breaks that prefix.
+export const PLAN_PROMPT_CACHE_KEY = "kabinet-plan";
+
+let cachedClient: { key: string; base: string; client: OpenAI } | undefined;
+
+// Reuses one client across investigations until the key or base URL changes
 export const createOpenAIClient = (config: InvestigationConfig) => {
   if (!config.openaiApiKey) {
     throw new Error("OpenAI API Key is missing");
   }
 
-  return new OpenAI({
-    apiKey: config.openaiApiKey,
-    baseURL: config.openaiApiBase || undefined,
-    dangerouslyAllowBrowser: true, // Required for client-side usage
+  const key = config.openaiApiKey;
+  const base = config.openaiApiBase;
+  if (cachedClient?.key !== key || cachedClient.base !== base) {
+    cachedClient = {
+      key,
+      base,
+      client: new OpenAI({
+        apiKey: key,
+        baseURL: base || undefined,
+        dangerouslyAllowBrowser: true, // Required for client-side usage
+      }),
+    };
+  }
+  return cachedClient.client;
+};
+
+// Wire form, with display-only fields such as `result` stripped
+export const toWireMessage = memoPerMessage(
+  (message: Message): Pick<Message, "role" | "content"> => ({
+    role: message.role,
+    content: message.content,
+  }),
+);
+
+// Called with each top-level plan member (key, raw JSON) once it is complete
+export type PlanMemberHandler = (key: string, value: string) => void;
+
+// Plans for byte-identical requests (same model, same context including the
+// minute-rounded time hint) are replayed instead of regenerated, e.g. when a
+// question is asked again. Oldest entry first, as in the query cache.
+const PLAN_CACHE_MAX_ENTRIES = 32;
+const planCache = new Map<string, string>();
+
+// Keys are SHA-256 digests, so neither the context nor its serialization is
+// kept alive. Each message is hashed once; a turn only hashes the model plus
+// the per-message digests.
+
+const sha256 = async (text: string) => {
+  const digest = await crypto.subtle.digest(
+    "SHA-256",
+    new TextEncoder().encode(text),
+  );
+  return Array.from(new Uint8Array(digest), (b) =>
+    b.toString(16).padStart(2, "0"),
+  ).join("");
+};
+
+const digestMessage = memoPerMessage(
+  (message: Pick<Message, "role" | "content">) =>
+    sha256(JSON.stringify([message.role, message.content])),
+);
+
+// Undefined where Web Crypto is unavailable (non-secure origins); such
+// requests are simply not cached
+export const planCacheKey = async (
+  model: string,
+  messages: Pick<Message, "role" | "content">[],
+): Promise<string | undefined> => {
+  if (!globalThis.crypto?.subtle) return undefined;
+  const digests = await Promise.all(messages.map(digestMessage));
+  return sha256([model, ...digests].join("\n"));
+};
+
+/**
+ * Returns the cached plan for `key`, if any. Members are still reported so
+ * callers behave as for a live stream.
+ */
+export const replayCachedPlan = (
+  key: string,
+  onMember?: PlanMemberHandler,
+): string | undefined => {
+  const cached = planCache.get(key);
+  if (cached === undefined) return undefined;
+  planCache.delete(key);
+  planCache.set(key, cached);
+  createJsonObjectScanner(onMember)(cached);
+  return cached;
+};
+
+// Only plans that parsed and passed checkPlan are stored, so a rejected or
+// broken reply is never replayed
+export const cachePlan = (key: string, content: string) => {
+  planCache.delete(key);
+  planCache.set(key, content);
+  if (planCache.size > PLAN_CACHE_MAX_ENTRIES) {
+    planCache.delete(planCache.keys().next().value!);
+  }
+};
+
+/**
+ * Streams a plan as a structured-output chat completion and returns the plan
+ * object text. Generation is aborted as soon as the top-level object closes,
+ * so trailing tokens the agent would discard are never waited for.
+ */
+export const streamPlanCompletion = async (
+  client: OpenAI,
+  params: Omit<
+    ChatCompletionCreateParamsStreaming,
+    "stream" | "response_format"
+  >,
+  onMember?: PlanMemberHandler,
+): Promise<string> => {
+  const stream = await client.chat.completions.create({
+    max_completion_tokens: PLAN_MAX_TOKENS,
+    prompt_cache_key: PLAN_PROMPT_CACHE_KEY,
+    ...params,
+    response_format: {
+      type: "json_schema",
+      json_schema: { name: PLAN_SCHEMA_NAME, schema: PLAN_SCHEMA },
+    },
+    stream: true,
+  });
+
+  const scan = createJsonObjectScanner(onMember);
+  let content = "";
+  for await (const chunk of stream) {
+    const delta = chunk.choices[0]?.delta?.content;
+    if (!delta) continue;
+
+    const end = scan(delta);
+    content += delta;
+    if (end >= 0) {
+      content = content.slice(0, end);
+      stream.controller.abort();
+      break;
+    }
+  }
+
+  return content;
+};
+
+export interface PlanResponse {
+  id: string;
+  content: string;
+}
+
+/**
+ * Streams a plan through the Responses API. Only the messages the server has
+ * not seen yet are sent; earlier turns are referenced by `previousResponseId`.
+ */
+export const streamPlanResponse = async (
+  client: OpenAI,
+  params: {
+    model: string;
+    instructions: string;
+    input: Message[];
+    previousResponseId?: string;
+  },
+  onMember?: PlanMemberHandler,
+): Promise<PlanResponse> => {
+  const stream = await client.responses.create({
+    model: params.model,
+    instructions: params.instructions,
+    input: params.input.map(toWireMessage),
+    previous_response_id: params.previousResponseId,
+    text: {
+      format: {
+        type: "json_schema",
+        name: PLAN_SCHEMA_NAME,
+        schema: PLAN_SCHEMA,
+      },
+    },
+    max_output_tokens: PLAN_MAX_TOKENS,
+    prompt_cache_key: PLAN_PROMPT_CACHE_KEY,
+    stream: true,
   });
+
+  // Let the response finish so it is stored and can be chained next turn
+  const scan = createJsonObjectScanner(onMember);
+  let id = "";
+  let content = "";
+  for await (const event of stream) {
+    if (event.type === "response.created") id = event.response.id;
+    else if (event.type === "response.output_text.delta") {
+      scan(event.delta);
+      content += event.delta;
+    }
+  }
+
+  return { id, content };
 };
+
+// Stored responses expire, after which chaining onto them fails with this code
+export const isPreviousResponseNotFound = (e: unknown) =>
+  e instanceof OpenAI.APIError && e.code === "previous_response_not_found";
@@ -0,0 +1,171 @@
+const QUERY_SCHEMA = {
+  type: "object",
+  properties: {
+    sql: { type: "string" },
+    start: { type: "string", format: "date-time" },
+    end: { type: "string", format: "date-time" },
+  },
+  required: ["sql", "start", "end"],
+  additionalProperties: false,
+};
+
+// Matches the prompt; stays under the analyzer's concurrency cap so a whole
+// batch runs in a single round
+const MAX_BATCH_PROBES = 3;
+
+/**
+ * JSON schema of an agent plan, sent as the structured output format so the
+ * model cannot return malformed or off-contract JSON. Property order matches
+ * the prompt so `thought` and the query stream out first.
+ *
+ * Not strict: `data.content` rows have free-form keys, which strict mode
+ * cannot express.
+ */
+export const PLAN_SCHEMA = {
+  type: "object",
+  properties: {
+    thought: { type: "string" },
+    hypothesis: { type: "string" },
+    confidence: { type: "number", minimum: 0, maximum: 1 },
+    query: QUERY_SCHEMA,
+    queries: {
+      type: "array",
+      minItems: 1,
+      maxItems: MAX_BATCH_PROBES,
+      items: {
+        ...QUERY_SCHEMA,
+        properties: { name: { type: "string" }, ...QUERY_SCHEMA.properties },
+        required: ["name", ...QUERY_SCHEMA.required],
+      },
+    },
+    recall: { type: "string", pattern: "^r[0-9]+$" },
+    final_analysis: { type: "string" },
+    data: {
+      type: "object",
+      properties: {
+        type: { type: "string", enum: ["table", "bar_chart", "line_chart"] },
+        title: { type: "string" },
+        content: { type: "array", items: { type: "object" } },
+      },
+      required: ["type", "title", "content"],
+    },
+  },
+  required: ["thought", "hypothesis"],
+  additionalProperties: false,
+};
+
+export const PLAN_SCHEMA_NAME = "kabinet_plan";
+
+interface JsonSchema {
+  type?: string;
+  properties?: Record<string, JsonSchema>;
+  required?: string[];
+  additionalProperties?: boolean;
+  items?: JsonSchema;
+  minItems?: number;
+  maxItems?: number;
+  enum?: string[];
+  minimum?: number;
+  maximum?: number;
+  pattern?: string;
+  format?: string;
+}
+
+// Returns a description of the first violation, or undefined if valid
+type Validator = (value: unknown, path: string) => string | undefined;
+
+/**
+ * Compiles the subset of JSON schema used above into a validator, so the
+ * schema is walked and its patterns are built once rather than per plan.
+ */
+const compile = (schema: JsonSchema): Validator => {
+  switch (schema.type) {
+    case "object": {
+      const properties = Object.entries(schema.properties ?? {}).map(
+        ([key, s]) => [key, compile(s)] as const,
+      );
+      const known = new Set(properties.map(([key]) => key));
+      const required = schema.required ?? [];
+      const closed = schema.additionalProperties === false;
+      return (value, path) => {
+        if (!value || typeof value !== "object" || Array.isArray(value)) {
+          return `${path}: expected an object`;
+        }
+        const obj = value as Record<string, unknown>;
+        // Chat-compatible providers often send explicit nulls for unused
+        // fields; those count as absent
+        for (const key of required) {
+          if (obj[key] == null) return `${path}.${key}: required`;
+        }
+        if (closed) {
+          for (const key in obj) {
+            if (!known.has(key)) return `${path}.${key}: unexpected field`;
+          }
+        }
+        for (const [key, check] of properties) {
+          if (obj[key] == null) continue;
+          const error = check(obj[key], `${path}.${key}`);
+          if (error) return error;
+        }
+        return undefined;
+      };
+    }
+    case "array": {
+      const items = schema.items ? compile(schema.items) : undefined;
+      const { minItems = 0, maxItems = Infinity } = schema;
+      return (value, path) => {
+        if (!Array.isArray(value)) return `${path}: expected an array`;
+        if (value.length < minItems || value.length > maxItems) {
+          return `${path}: expected ${minItems} to ${maxItems} items`;
+        }
+        if (!items) return undefined;
+        for (let i = 0; i < value.length; i++) {
+          const error = items(value[i], `${path}[${i}]`);
+          if (error) return error;
+        }
+        return undefined;
+      };
+    }
+    case "string": {
+      const allowed = schema.enum && new Set(schema.enum);
+      const pattern = schema.pattern ? new RegExp(schema.pattern) : undefined;
+      const dateTime = schema.format === "date-time";
+      return (value, path) => {
+        if (typeof value !== "string") return `${path}: expected a string`;
+        if (allowed && !allowed.has(value)) {
+          return `${path}: expected one of ${[...allowed].join(", ")}`;
+        }
+        if (pattern && !pattern.test(value)) {
+          return `${path}: does not match ${schema.pattern}`;
+        }
+        if (dateTime && Number.isNaN(Date.parse(value))) {
+          return `${path}: expected an ISO 8601 timestamp`;
+        }
+        return undefined;
+      };
+    }
+    case "number": {
+      const { minimum = -Infinity, maximum = Infinity } = schema;
+      return (value, path) =>
+        typeof value !== "number" || value < minimum || value > maximum
+          ? `${path}: expected a number from ${minimum} to ${maximum}`
+          : undefined;
+    }
+    default:
+      return () => undefined;
+  }
+};
+
+const validatePlan = compile(PLAN_SCHEMA);
+
+// Checks a parsed plan against PLAN_SCHEMA; returns the first problem found
+export const checkPlan = (plan: unknown) => validatePlan(plan, "plan");
+
+const validateQuery = compile(PLAN_SCHEMA.properties.query);
+const validateQueries = compile(PLAN_SCHEMA.properties.queries);
+
+// Checks a streamed `query` or `queries` member before it is dispatched early
+export const checkProbeMember = (key: "query" | "queries", value: unknown) =>
+  key === "query"
+    ? validateQuery(value, "plan.query")
+    : validateQueries(value, "plan.queries");
@@ -0,0 +1,66 @@
+// Backstop for unbounded row dumps. It also caps aggregates with many
+// groups, so a result that reaches it is reported as incomplete.
+export const DEFAULT_LIMIT = 1000;
+
+const LEADING_KEYWORD_RE = /^\s*\(*\s*(SELECT|WITH|FROM)\b/i;
+const FORBIDDEN_RE =
+  /\b(INSERT|UPDATE|DELETE|DROP|CREATE|ALTER|ATTACH|DETACH|COPY|PRAGMA|INSTALL|LOAD|EXPORT|IMPORT|CALL|SET)\b/i;
+const LIMIT_RE = /\bLIMIT\b/i;
+const EVENTS_RE = /\$events\b/;
+
+// Blanks out string literals, quoted identifiers and comments so keyword
+// checks only see SQL structure. Offsets are preserved.
+const maskLiterals = (sql: string) =>
+  sql.replace(
+    /'(?:[^']|'')*'|"(?:[^"]|"")*"|--[^\n]*|\/\*[\s\S]*?\*\//g,
+    (m) => " ".repeat(m.length),
+  );
+
+export type SqlCheck =
+  | { sql: string; limitApplied: boolean; error?: undefined }
+  | { error: string };
+
+/**
+ * Cheap local checks run before a query is sent, so obviously broken probes
+ * fail in microseconds instead of costing an analyzer round-trip. Returns the
+ * SQL to send, with a LIMIT appended when the query has none (`limitApplied`),
+ * or the reason it was rejected.
+ */
+export const checkQuery = (
+  query: string,
+  start: string,
+  end: string,
+): SqlCheck => {
+  const startMs = Date.parse(start);
+  const endMs = Date.parse(end);
+  if (Number.isNaN(startMs) || Number.isNaN(endMs)) {
+    return { error: "start and end must be ISO 8601 timestamps" };
+  }
+  if (startMs >= endMs) return { error: "start must be before end" };
+
+  let sql = query.trim();
+  let masked = maskLiterals(sql);
+  // A single trailing semicolon is harmless; drop it so LIMIT can follow
+  if (masked.trimEnd().endsWith(";")) {
+    const cut = masked.lastIndexOf(";");
+    sql = sql.slice(0, cut).trimEnd();
+    masked = masked.slice(0, cut).trimEnd();
+  }
+
+  if (!sql) return { error: "empty query" };
+  if (masked.includes(";")) return { error: "only one statement is allowed" };
+  if (!LEADING_KEYWORD_RE.test(masked)) {
+    return { error: "only SELECT queries are allowed" };
+  }
+  const forbidden = FORBIDDEN_RE.exec(masked);
+  if (forbidden) {
+    return { error: `${forbidden[1].toUpperCase()} is not allowed` };
+  }
+  if (!EVENTS_RE.test(masked)) {
+    return { error: "query must read from $events" };
+  }
+
+  const limitApplied = !LIMIT_RE.test(masked);
+  if (limitApplied) sql += `\nLIMIT ${DEFAULT_LIMIT}`;
+  return { sql, limitApplied };
+};
@@ -0,0 +1,29 @@
+import type { Message } from "../../types/agent";
+import { SYSTEM_MESSAGE, SYSTEM_PROMPT } from "./prompts";
+import { memoPerMessage } from "./utils";
+
+// Rough BPE ratio for English prose and JSON; only used for budgeting, so
+// staying a little pessimistic is better than shipping a tokenizer.
+const CHARS_PER_TOKEN = 3.5;
+// Per-message framing added by the chat format
+const MESSAGE_OVERHEAD_TOKENS = 4;
+
+// Stay well below the model window so an oversized request is caught locally
+// instead of failing after the whole body has been uploaded.
+export const CONTEXT_TOKEN_BUDGET = 100_000;
+
+export const estimateTokens = (text: string) =>
+  Math.ceil(text.length / CHARS_PER_TOKEN);
+
+export const SYSTEM_PROMPT_TOKENS = estimateTokens(SYSTEM_PROMPT);
+
+// Each message is measured once per investigation rather than once per turn.
+// The shared system message is counted up front, at import.
+const messageTokens = memoPerMessage(
+  (message: Message) =>
+    MESSAGE_OVERHEAD_TOKENS + estimateTokens(message.content),
+  [[SYSTEM_MESSAGE, MESSAGE_OVERHEAD_TOKENS + SYSTEM_PROMPT_TOKENS]],
+);
+
+export const contextTokens = (messages: Message[]) =>
+  messages.reduce((sum, m) => sum + messageTokens(m), 0);
@@ -1,22 +1,295 @@
-import type { QueryResult } from "../../types/agent";
+import type { AgentPlan, Message, QueryResult } from "../../types/agent";
 
-export const summarizeResult = (result: QueryResult): string => {
-  if (result.error) {
-    return `Query failed with error: ${result.error}`;
+// Some OpenAI-compatible providers wrap JSON-mode output in a ```json fence.
+// The closing fence may be missing when the stream is cut at the object end.
+// Only the ends are checked, so fences inside string values are left alone.
+const FENCE = "```";
+const JSON_FENCE = "```json";
+
+/**
+ * Best-effort fix for the ways a plan breaks in practice: output cut off by
+ * the token cap (open strings, objects and arrays, or a key with no value
+ * yet) and trailing commas. Anything else is left for JSON.parse to reject.
+ *
+ * `cutKey` names the top-level member whose string value had to be closed,
+ * i.e. whose text is incomplete.
+ */
+export const repairJson = (
+  text: string,
+): { json: string; cutKey?: string } => {
+  let out = "";
+  const closers: string[] = [];
+  let inString = false;
+  let escaped = false;
+  // Last non-whitespace character outside strings
+  let prev = "";
+  let isKey = false;
+  let keyStart = -1;
+  let topKey: string | undefined;
+  for (const ch of text) {
+    if (inString) {
+      if (escaped) escaped = false;
+      else if (ch === "\\") escaped = true;
+      else if (ch === '"') {
+        inString = false;
+        prev = ch;
+        if (isKey && closers.length === 1) topKey = out.slice(keyStart + 1);
+      }
+      out += ch;
+      continue;
+    }
+    if (ch === '"') {
+      inString = true;
+      // Strings right after `{` or `,` inside an object are member keys
+      isKey = closers.at(-1) === "}" && (prev === "{" || prev === ",");
+      if (isKey) keyStart = out.length;
+    } else if (ch === "{") closers.push("}");
+    else if (ch === "[") closers.push("]");
+    else if (ch === "}" || ch === "]") {
+      closers.pop();
+      out = out.replace(/,\s*$/, "");
+    }
+    if (ch.trim()) prev = ch;
+    out += ch;
   }
 
-  const resultsList = result.results || [];
-  if (resultsList.length === 0) {
-    return "Query returned no results (an empty list: []).";
+  let cutKey: string | undefined;
+  if (inString && !isKey) {
+    out += escaped ? '\\"' : '"';
+    cutKey = topKey;
+  } else if (inString || prev === ":" || (prev === '"' && isKey)) {
+    // A key without its value: drop it
+    out = out.slice(0, keyStart);
   }
+  out = out.replace(/,\s*$/, "");
+  return { json: out + closers.reverse().join(""), cutKey };
+};
 
-  const count = resultsList.length;
-  const columns = Object.keys(resultsList[0]).join(", ");
+// Shown in place of the part of a conclusion lost to the token cap
+const TRUNCATED_NOTE = " … [truncated: the answer hit the output token limit]";
 
-  let summary = `Query returned ${count} rows. Columns: ${columns}. `;
-  if (count > 0) {
-    summary += `First row summary: ${JSON.stringify(resultsList[0])}`;
+export const parsePlan = (content: string): AgentPlan => {
+  let text = content.trim();
+  if (text.startsWith(FENCE)) {
+    text = text.slice(
+      text.startsWith(JSON_FENCE) ? JSON_FENCE.length : FENCE.length,
+    );
+  }
+  if (text.endsWith(FENCE)) text = text.slice(0, -FENCE.length);
+  // JSON.parse ignores the whitespace left around the object
+  try {
+    return JSON.parse(text);
+  } catch (e) {
+    let plan: AgentPlan;
+    const { json, cutKey } = repairJson(text);
+    try {
+      plan = JSON.parse(json);
+    } catch {
+      throw e;
+    }
+    // A cut-off conclusion must not read as a complete one
+    if (cutKey === "final_analysis" && plan.final_analysis) {
+      plan.final_analysis += TRUNCATED_NOTE;
+    }
+    return plan;
   }
+};
+
+/**
+ * Caches `fn` per message object. Messages are frozen when they are added to
+ * an investigation, so a value derived from one never goes stale and is
+ * computed once rather than on every turn.
+ */
+export const memoPerMessage = <K extends object, V>(
+  fn: (message: K) => V,
+  seed?: Iterable<readonly [K, V]>,
+) => {
+  const cache = new WeakMap<K, V>(seed);
+  return (message: K): V => {
+    if (cache.has(message)) return cache.get(message)!;
+    const value = fn(message);
+    cache.set(message, value);
+    return value;
+  };
+};
 
-  return summary;
+const truncateStrings = (value: unknown, strCap: number): unknown => {
+  if (typeof value === "string") {
+    return value.length > strCap
+      ? `${value.slice(0, strCap)}…(+${value.length - strCap} more)`
+      : value;
+  }
+  if (Array.isArray(value)) {
+    return value.map((v) => truncateStrings(v, strCap));
+  }
+  if (value && typeof value === "object") {
+    return Object.fromEntries(
+      Object.entries(value).map(([k, v]) => [k, truncateStrings(v, strCap)]),
+    );
+  }
+  return value;
+};
+
+// Column-wise layout: every key appears once instead of once per row
+const toColumns = (rows: Record<string, unknown>[]) => {
+  const columns: Record<string, unknown[]> = {};
+  rows.forEach((row, i) => {
+    for (const key in row) {
+      (columns[key] ??= new Array(rows.length).fill(null))[i] = row[key];
+    }
+  });
+  return columns;
+};
+
+const pickColumns = (row: Record<string, unknown>, keys: string[]) =>
+  Object.fromEntries(keys.filter((k) => k in row).map((k) => [k, row[k]]));
+
+// Wide rows, e.g. from SELECT * with its metadata, involvedObject and related
+// structs, keep their first columns; the rest are only listed by name
+const MAX_COLUMNS = 12;
+
+/**
+ * Bounds a query result for the AI context: only the first `rowCap` rows and
+ * MAX_COLUMNS columns are kept and long strings are cut to `strCap`
+ * characters. Several rows are emitted column-wise as
+ * `columns: { name: [values in row order] }`. A result cut by the locally
+ * added LIMIT says so, since its row count is not a total.
+ */
+export const boundResult = (
+  result: QueryResult,
+  rowCap = 50,
+  strCap = 400,
+): Record<string, unknown> => {
+  if (result.error || !result.results) {
+    return { error: result.error, results: result.results };
+  }
+
+  const rows: Record<string, unknown>[] = result.results.slice(0, rowCap);
+  const keys = [...new Set(rows.flatMap((row) => Object.keys(row)))];
+  const kept = keys.slice(0, MAX_COLUMNS);
+  const shown = rows
+    .map((row) => (keys.length > MAX_COLUMNS ? pickColumns(row, kept) : row))
+    .map((row) => truncateStrings(row, strCap) as Record<string, unknown>);
+  const bounded: Record<string, unknown> =
+    shown.length > 1 ? { columns: toColumns(shown) } : { results: shown };
+
+  const truncated: Record<string, unknown> = {};
+  if (result.limited) {
+    truncated.rows_total = `>=${result.limited} (LIMIT added locally)`;
+    truncated.rows_shown = shown.length;
+    truncated.hint =
+      "More rows matched. Aggregate with COUNT/GROUP BY or narrow the time window instead of counting these rows.";
+  } else if (result.results.length > rowCap) {
+    truncated.rows_total = result.results.length;
+    truncated.rows_shown = rowCap;
+  }
+  if (keys.length > MAX_COLUMNS) {
+    truncated.columns_omitted = keys.slice(MAX_COLUMNS);
+  }
+  if (Object.keys(truncated).length) bounded._truncated = truncated;
+  return bounded;
+};
+
+// Emitted without indentation; the AI does not need the whitespace
+export const compactResult = (
+  result: QueryResult,
+  rowCap?: number,
+  strCap?: number,
+): string => JSON.stringify(boundResult(result, rowCap, strCap));
+
+// Combined observation for a batch of named probes
+export const compactResults = (
+  results: Record<string, QueryResult>,
+  rowCap?: number,
+  strCap?: number,
+): string =>
+  JSON.stringify(
+    Object.fromEntries(
+      Object.entries(results).map(([name, r]) => [
+        name,
+        boundResult(r, rowCap, strCap),
+      ]),
+    ),
+  );
+
+// Observations only carry a sample; the full result stays on the message
+// under its handle and is recalled into the context on request.
+export const SAMPLE_ROWS = 5;
+export const SAMPLE_STR_CAP = 200;
+
+export const nextResultId = (messages: Message[]) =>
+  `r${messages.filter((m) => m.resultId).length + 1}`;
+
+export const findResult = (messages: Message[], id: string) =>
+  messages.find((m) => m.resultId === id)?.result;
+
+// Single results only ever carry `results` and/or `error`
+export const isResultBatch = (
+  result: QueryResult | Record<string, QueryResult>,
+): result is Record<string, QueryResult> =>
+  !("results" in result) && !("error" in result);
+
+// Browsers close an unused preconnected socket after roughly ten seconds,
+// so a hint older than that is replaced with a fresh one.
+const PRECONNECT_REFRESH_MS = 10_000;
+const preconnected = new Map<string, { link: HTMLLinkElement; at: number }>();
+
+/**
+ * Asks the browser to open the DNS/TCP/TLS connection to `url`'s origin ahead
+ * of the first request, e.g. while the user is still typing. Same-origin and
+ * invalid URLs are ignored, and repeated calls are cheap.
+ */
+export const preconnect = (url: string) => {
+  let origin: string;
+  try {
+    origin = new URL(url, window.location.href).origin;
+  } catch {
+    return;
+  }
+  if (origin === window.location.origin) return;
+  const now = Date.now();
+  const previous = preconnected.get(origin);
+  if (previous && now - previous.at < PRECONNECT_REFRESH_MS) return;
+  previous?.link.remove();
+
+  const link = document.createElement("link");
+  link.rel = "preconnect";
+  link.href = origin;
+  // API calls are CORS fetches without credentials
+  link.crossOrigin = "anonymous";
+  document.head.appendChild(link);
+  preconnected.set(origin, { link, at: now });
+};
+
+// Conservative: only definition-style questions with no sign of a concrete
+// incident skip the agent loop. Anything else is investigated as before.
+const INFORMATIONAL_RE =
+  /^\s*(what (is|are|does)|explain|define|describe|how (does|do)|difference between)\b/i;
+const DIAGNOSTIC_RE =
+  /\b(why|fail\w*|error\w*|crash\w*|pending|oom\w*|evict\w*|restart\w*|kill\w*|not|down|slow|unstable|issue|problem|warn\w*|events?|top|most|count\w*|happen\w*|caus\w*|my|our|cluster|node-\S+|namespace|today|yesterday|last|recent\w*|how (many|often))\b/i;
+
+export const isInformationalQuestion = (text: string) =>
+  INFORMATIONAL_RE.test(text) && !DIAGNOSTIC_RE.test(text);
+
+let minuteCache: { minute: number; message: Message } | undefined;
+
+/**
+ * Time hint for the current UTC minute. Within a minute every turn gets the
+ * same frozen message, so the prompt stays byte-identical for caching and
+ * per-message caches (token counts, wire form) hit instead of rebuilding.
+ */
+export const timeHintMessage = (): Message => {
+  const minute = Math.floor(Date.now() / 60_000);
+  if (minuteCache?.minute !== minute) {
+    // Second precision, like the prompt's examples: 2025-08-05T15:00:00Z
+    const iso = `${new Date(minute * 60_000).toISOString().slice(0, 19)}Z`;
+    minuteCache = {
+      minute,
+      message: Object.freeze({
+        role: "system",
+        content: `The current UTC time is ${iso}. Use this to construct your query's time range.`,
+      }),
+    };
+  }
+  return minuteCache.message;
 };
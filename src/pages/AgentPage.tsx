@@ -21,6 +21,7 @@ const AgentPage = () => {
     currentQuery,
     start,
     stop,
+    warmUp,
     clearSession,
     loadSession,
   } = useInvestigation(config);
@@ -83,6 +84,7 @@ const AgentPage = () => {
           currentQuery={currentQuery}
           onStartInvestigation={start}
           onStop={stop}
+          onTyping={warmUp}
         />
       </Card>
 
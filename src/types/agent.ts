@@ -1,28 +1,46 @@
 export interface Message {
   role: "system" | "user" | "assistant";
   content: string;
+  // Full query result(s) for display; `content` holds the bounded copy the AI sees
+  result?: QueryResult | Record<string, QueryResult>;
+  // Handle the AI uses to recall `result` when `content` only holds a sample
+  resultId?: string;
 }
 
 export interface InvestigationConfig {
   openaiApiKey: string;
   openaiApiBase: string;
   openaiModel?: string;
+  // Used for turns expected to conclude and retries after an unparseable
+  // plan; unset keeps every turn on `openaiModel`
+  openaiFinalModel?: string;
+  openaiResponsesApi?: boolean;
   kubeApiUrl: string;
 }
 
 export interface QueryResult {
   results?: any[];
   error?: string;
+  // Set when the LIMIT added locally was reached, so more rows matched
+  limited?: number;
+}
+
+export interface PlanQuery {
+  sql: string;
+  start: string;
+  end: string;
 }
 
 export interface AgentPlan {
   thought?: string;
   hypothesis?: string;
-  query?: {
-    sql: string;
-    start: string;
-    end: string;
-  };
+  // 0..1; a stable, confident hypothesis ends the investigation early
+  confidence?: number;
+  query?: PlanQuery;
+  // Independent probes dispatched concurrently, keyed by name in the result
+  queries?: (PlanQuery & { name: string })[];
+  // Handle of an earlier result to bring back in full instead of re-querying
+  recall?: string;
   final_analysis?: string;
   data?: {
     type: "table" | "bar_chart" | "line_chart";